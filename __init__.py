@@ -22,70 +22,72 @@ bl_info = {
 # ----------------------------------------------------------
 
 import bpy
-from bpy.props import (PointerProperty, CollectionProperty, StringProperty, EnumProperty)
-from . uisettings import *
-from . shapekeytransfer import *
+from bpy.props import (PointerProperty, CollectionProperty, StringProperty, EnumProperty, IntProperty)
+
+# The addon modules are only imported when the addon is registered so that
+# Blender's addon scanner only has to evaluate bl_info
+def load_modules():
+    global register_classes, unregister_classes
+    from . import uisettings, shapekeytransfer
+    for mod in (uisettings, shapekeytransfer):
+        globals().update({k: v for k, v in vars(mod).items() if not k.startswith('_')})
+
+    classes = (UISettings,
+               TransferShapeKeysOperatorUI,
+               ShapeKeyItem,
+               CopyDrivers,
+               CopyKeyNamesOperator,
+               InsertKeyNamesOperator,
+               TransferShapeKeyOperator,
+               CopyShapeKeys,
+               TransferExcludedShapeKeyOperator,
+               RemoveShapeKeyOperator,
+               CUSTOM_OT_actions,
+               CUSTOM_OT_clearList,
+               CUSTOM_OT_removeDuplicates,
+               CUSTOM_UL_items,
+               VIEW3D_PT_tools_ShapeKeyTransfer,
+               )
+    register_classes, unregister_classes = bpy.utils.register_classes_factory(classes)
 
-    
 # Custom scene properties
 
-bpy.types.Scene.customshapekeylist_index = IntProperty()
-bpy.types.Scene.srcMeshShapeKey = StringProperty()
-bpy.types.Scene.destMeshShapeKey = StringProperty()
+_LIST_USE_ITEMS = (
+    ('all', 'all', 'Transfer all shape keys in the source mesh', 'HIDE_OFF', 0),
+    ('include', 'include', 'Include all shape keys in the list', 'HIDE_OFF', 1),
+    ('exclude', 'exclude', 'Exclude all shape keys in the list', 'HIDE_ON', 2),
+)
 
 def load_custom_properties():
+    bpy.types.Scene.customshapekeylist_index = IntProperty()
+    bpy.types.Scene.srcMeshShapeKey = StringProperty()
+    bpy.types.Scene.destMeshShapeKey = StringProperty()
     bpy.types.Scene.shapekeytransferSettings = PointerProperty(type=UISettings)
     bpy.types.Scene.listUse = EnumProperty(
-        items=[
-            ('all', 'all', 'Transfer all shape keys in the source mesh', 'HIDE_OFF', 0),
-            ('include', 'include', 'Include all shape keys in the list', 'HIDE_OFF', 1),
-            ('exclude', 'exclude', 'Exclude all shape keys in the list', 'HIDE_ON', 2)
-        ],
+        items=_LIST_USE_ITEMS,
         default="all"
     )
     bpy.types.Scene.customshapekeylist = CollectionProperty(type=ShapeKeyItem)
 
+def unload_custom_properties():
+    del bpy.types.Scene.customshapekeylist_index
+    del bpy.types.Scene.srcMeshShapeKey
+    del bpy.types.Scene.destMeshShapeKey
+    del bpy.types.Scene.shapekeytransferSettings
+    del bpy.types.Scene.listUse
+    del bpy.types.Scene.customshapekeylist
+
 #bpy.app.handlers.load_post.append(load_custom_properties)
 
 def register():
-    bpy.utils.register_class(UISettings)
-    bpy.utils.register_class(TransferShapeKeysOperatorUI)
-    bpy.utils.register_class(ShapeKeyItem)
-    bpy.utils.register_class(CopyDrivers)
-
-    bpy.utils.register_class(CopyKeyNamesOperator)
-    bpy.utils.register_class(InsertKeyNamesOperator)
-    bpy.utils.register_class(TransferShapeKeyOperator)
-    bpy.utils.register_class(CopyShapeKeys)
-    bpy.utils.register_class(TransferExcludedShapeKeyOperator)
-    bpy.utils.register_class(RemoveShapeKeyOperator)
-    bpy.utils.register_class(CUSTOM_OT_actions)
-    bpy.utils.register_class(CUSTOM_OT_clearList)
-    bpy.utils.register_class(CUSTOM_OT_removeDuplicates)
-    bpy.utils.register_class(CUSTOM_UL_items)
-
+    load_modules()
+    register_classes()
     load_custom_properties()
 
-    bpy.utils.register_class(VIEW3D_PT_tools_ShapeKeyTransfer)
-
 
 # unregister
 # ----------------------------------------------------------
 
 def unregister():
-    bpy.utils.unregister_class(UISettings)
-    bpy.utils.unregister_class(TransferShapeKeysOperatorUI)
-    bpy.utils.unregister_class(ShapeKeyItem)
-    bpy.utils.unregister_class(CopyDrivers)
-
-    bpy.utils.unregister_class(CopyKeyNamesOperator)
-    bpy.utils.unregister_class(InsertKeyNamesOperator)
-    bpy.utils.unregister_class(TransferShapeKeyOperator)
-    bpy.utils.unregister_class(CopyShapeKeys)
-    bpy.utils.unregister_class(TransferExcludedShapeKeyOperator)
-    bpy.utils.unregister_class(RemoveShapeKeyOperator)
-    bpy.utils.unregister_class(CUSTOM_OT_actions)
-    bpy.utils.unregister_class(CUSTOM_OT_clearList)
-    bpy.utils.unregister_class(CUSTOM_OT_removeDuplicates)
-    bpy.utils.unregister_class(CUSTOM_UL_items)
-    bpy.utils.unregister_class(VIEW3D_PT_tools_ShapeKeyTransfer)
+    unload_custom_properties()
+    unregister_classes()
@@ -1,37 +1,81 @@
+import re
+import logging
+from collections import namedtuple
 import bpy
 
+log = logging.getLogger(__name__)
+
+# data path of a shape key value driver, captures the shape key name
+_SK_PATH_RE = re.compile(r'key_blocks\["(.*)"\]\.value')
+
+# FModifier attributes copied from the source driver. type is set when the
+# modifier is created
+_MOD_ATTRS = ('active', 'blend_in', 'blend_out', 'influence', 'mode', 'mute',
+              'poly_order', 'use_additive', 'use_influence')
+
+# DriverTarget attributes copied for each driver variable
+_VAR_TGT_ATTRS = ('id', 'bone_target', 'data_path', 'rotation_mode',
+                  'transform_space', 'transform_type')
+
+# FCurve flags copied from the source driver
+_FCURVE_ATTRS = ('hide', 'lock', 'mute', 'select')
+
+# Driver attributes copied from the source driver
+_DRIVER_ATTRS = ('expression', 'is_valid', 'type', 'use_self')
+
+# Values read from a source driver before anything is written to the
+# destination
+_DriverSnapshot = namedtuple('_DriverSnapshot',
+                             ('shape_name', 'index', 'fcurve', 'driver',
+                              'modifiers', 'variables'))
+
+def _get_attrs(src, attrs):
+    # skip attributes which are missing in this Blender version
+    return {a: getattr(src, a) for a in attrs if hasattr(src, a)}
+
+def _set_attrs(dst, values):
+    for a, value in values.items():
+        # skip attributes which are read-only in this Blender version
+        try:
+            setattr(dst, a, value)
+        except AttributeError:
+            pass
+
+def _copy_attrs(src, dst, attrs):
+    _set_attrs(dst, _get_attrs(src, attrs))
+
 class Drivers:
     """Copy Driver to destination object"""
+    __slots__ = ('_Drivers__src_obj', '_Drivers__dst_obj')
+
     def __init__(self, src, dst):
         self.__src_obj = src
         self.__dst_obj = dst
 
+    @classmethod
+    def from_objects(cls, src, dst):
+        """Create a Drivers instance for the source and destination objects"""
+        self = cls.__new__(cls)
+        self.__src_obj = src
+        self.__dst_obj = dst
+        return self
+
     def __populate_modifier(self, src, dst):
-        dst.active = src.active
-        dst.blend_in = src.blend_in
-        dst.blend_out = src.blend_out
-        dst.influence = src.influence
-        dst.mode = src.mode
-        dst.mute = src.mute
-        dst.poly_order = src.poly_order
-        # type should be created when the modifier is created
-        #mod.type = m['type']
-        dst.use_additive = src.use_additive
-        dst.use_influence = src.use_influence
-        dst.coefficients[0] = src.coefficients[0]
-        dst.coefficients[1] = src.coefficients[1]
+        _copy_attrs(src, dst, _MOD_ATTRS)
+        dst.coefficients[:2] = src.coefficients[:2]
 
     def __populate_modifiers(self, srcm, dstm):
         i = 0
-        if len(srcm) <= 0 or len(dstm) <= 0:
+        if not srcm or not dstm:
             return
         mod = dstm[0]
+        new = dstm.new
         for m in srcm:
             if i == 0:
                 self.__populate_modifier(m, mod)
                 i = i + 1
             else:
-                mod = dst.modifiers.new(m.type)
+                mod = new(m.type)
                 self.__populate_modifier(m, mod)
 
     def __create_variable(self, var, driver):
@@ -41,41 +85,59 @@ class Drivers:
         v.type = var.type
 
         # we have one target by default
-        v.targets[0].id = var.targets[0].id
-        v.targets[0].bone_target = var.targets[0].bone_target
-        v.targets[0].data_path = var.targets[0].data_path
-        v.targets[0].rotation_mode = var.targets[0].rotation_mode
-        v.targets[0].transform_space = var.targets[0].transform_space
-        v.targets[0].transform_type = var.targets[0].transform_type
+        src_tgt = var.targets[0]
+        dst_tgt = v.targets[0]
+        _copy_attrs(src_tgt, dst_tgt, _VAR_TGT_ATTRS)
 
     def copy(self):
         # iterate over all the shape key drivers in the source mesh
-        num_drivers = 0
-        for d in self.__src_obj.data.shape_keys.animation_data.drivers:
-            print("--------->"+d.data_path)
-            shape_name = d.data_path.replace('key_blocks["', '').replace('"].value', '')
-            idx = self.__dst_obj.data.shape_keys.key_blocks.find(shape_name)
+        copied = []
+        # nothing to do if the source has no drivers or the destination has
+        # no shape keys to attach them to
+        ad = getattr(self.__src_obj.data.shape_keys, 'animation_data', None)
+        if ad is None or not ad.drivers:
+            return len(copied)
+        dst_shape_keys = self.__dst_obj.data.shape_keys
+        if dst_shape_keys is None:
+            return len(copied)
+        # local store for faster access in the loop
+        dst_key_blocks = dst_shape_keys.key_blocks
+        name_to_idx = {kb.name: i for i, kb in enumerate(dst_key_blocks)}
+        src_drivers = ad.drivers
+        dst_ad = dst_shape_keys.animation_data
+        dst_paths = {fc.data_path for fc in dst_ad.drivers} if dst_ad else set()
+        # read all the source drivers first, then write them in one pass
+        snapshots = []
+        for d in src_drivers:
+            log.debug("driver %s", d.data_path)
+            m = _SK_PATH_RE.match(d.data_path)
+            # not a shape key value driver
+            if m is None:
+                continue
+            shape_name = m.group(1)
+            idx = name_to_idx.get(shape_name, -1)
             if  idx == -1:
-                print("Can't find shape key: %s" % (shape_name))
+                log.debug("Can't find shape key: %s", shape_name)
                 continue
             # Copy driver but don't overwrite existing data
-            #check = self.__dst_obj.data.shape_keys.animation_data and \
-            #        self.__dst_obj.data.shape_keys.animation_data.drivers.find(d.data_path)
-            #if check:
-            #    print("%s has animation data" % (d.data_path))
-            #    continue
-            driver = self.__dst_obj.data.shape_keys.key_blocks[idx].driver_add('value')
-            driver.hide = d.hide
-            driver.lock = d.lock
-            driver.mute = d.mute
-            driver.select = d.select
-            self.__populate_modifiers(d.modifiers, driver.modifiers)
-            driver.driver.expression = d.driver.expression
-            driver.driver.is_valid = d.driver.is_valid
-            driver.driver.type = d.driver.type
-            driver.driver.use_self = d.driver.use_self
-            for var in d.driver.variables:
-                self.__create_variable(var, driver)
-            num_drivers += 1
-        return num_drivers
+            if d.data_path in dst_paths:
+                log.debug("%s has animation data", d.data_path)
+                continue
+            snapshots.append(_DriverSnapshot(shape_name, idx,
+                                             _get_attrs(d, _FCURVE_ATTRS),
+                                             _get_attrs(d.driver, _DRIVER_ATTRS),
+                                             list(d.modifiers),
+                                             list(d.driver.variables)))
 
+        for snap in snapshots:
+            driver = dst_key_blocks[snap.index].driver_add('value')
+            _set_attrs(driver, snap.fcurve)
+            self.__populate_modifiers(snap.modifiers, driver.modifiers)
+            _set_attrs(driver.driver, snap.driver)
+            for var in snap.variables:
+                self.__create_variable(var, driver)
+            copied.append(snap.shape_name)
+        # tag the shape keys once rather than per driver
+        if copied:
+            dst_shape_keys.update_tag()
+        return len(copied)
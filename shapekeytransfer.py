@@ -21,10 +21,12 @@
 
 import bpy
 import bmesh
+import itertools
+import numpy as np
 from mathutils import Vector
+from mathutils.kdtree import KDTree
 from . import bl_info
 from .uisettings import TransferShapeKeysOperatorUI
-from .copydrivers import Drivers
 
 from bpy.props import (StringProperty,
                        BoolProperty,
@@ -45,6 +47,40 @@ def get_parent(mesh):
             return ob
     return None
 
+# map every object data to the first object using it. Build it once when
+# several meshes need their parent resolved
+def build_parent_map():
+    parent_map = {}
+    for ob in bpy.data.objects:
+        if ob.data is not None:
+            parent_map.setdefault(ob.data, ob)
+    return parent_map
+
+# read all vertex positions of a shape key as a (n, 3) float32 array,
+# optionally into an existing contiguous array
+def get_shape_key_co(key_block, out=None):
+    if out is None:
+        out = np.empty((len(key_block.data), 3), dtype=np.float32)
+    key_block.data.foreach_get('co', out.reshape(-1))
+    return out
+
+# write all vertex positions of a shape key from a (n, 3) float32 array
+def set_shape_key_co(key_block, co):
+    key_block.data.foreach_set('co', co.ravel())
+
+# iterate over range(n) while showing the progress in the window manager.
+# The progress is ended even if the loop is left by an exception
+def progress_range(n, step=512):
+    wm = bpy.context.window_manager
+    wm.progress_begin(0, n)
+    try:
+        for i in range(n):
+            if(i % step == 0):
+                wm.progress_update(i)
+            yield i
+    finally:
+        wm.progress_end()
+
 # Class which handles shape key transfers
 # ----------------------------------------------------------
 
@@ -63,6 +99,8 @@ class ShapeKeyTransfer:
         self.total_vertices       = 0
         self.specify_end_vertex   = False # not yet implemented
         self.use_one_vertex       = True
+        # 'KDTREE', 'NUMBA' or 'CUDA', see get_backend_kernel
+        self.backend              = 'KDTREE'
 
         # shape keys to ignore
         self.default_excluded_keys = self.excluded_shape_keys = ['Basis', 'basis', 'Expressions_IDHumans_max'] 
@@ -70,106 +108,164 @@ class ShapeKeyTransfer:
         # internal references used by this class
         self.dest_mesh            = None
         self.src_mesh             = None
-        self.src_mwi              = None
-        self.dest_shape_key_index = 0
-        self.src_shape_key_index  = 0
-        self.do_once_per_vertex   = False        
-        self.current_vertex       = None
-        self.src_chosen_vertices  = []
+        # inverse source world matrix as a (3x3 rotation/scale, translation)
+        # pair, object matrices are affine
+        self.src_mwi_np           = None
+        self.src_local_scale      = 1.0
+        self.src_kdtree           = None
+        # shape key name to key_blocks index of both meshes
+        self.dest_key_index       = {}
+        self.src_key_index        = {}
+        # source basis in row 0 followed by the transferred shape keys
+        self.src_stack            = None
+        self.src_row              = {}
+        self.src_basis            = None
+        self.dest_basis           = None
+        self.dest_world           = None
+        self.dest_local           = None
+        self.dest_co              = {}
         self.message              = ""
         self.skip_vertices_with_no_pair = False
 
-    # select required vertices within a radius and return array of indices
-    def select_vertices(self, center, radius):            
+    # select source vertices within a radius around lco, both in source
+    # local space, and return array of indices
+    def select_vertices(self, lco, local_radius):
         src_chosen_vertices = []
-        closest_vertex_index = -1
-        radius_vec = center + Vector((0, 0, radius))        
-        # put selection sphere in local coords.
-        lco = self.src_mwi @ center
-        r   = self.src_mwi @ (radius_vec) - lco
-        closest_length = r.length        
-
-        # select verts within radius
-        for index, v in enumerate(self.src_mesh.data.shape_keys.key_blocks[0].data):
-            is_selected = (v.co - lco).length <= r.length     
-            if(is_selected):
-                src_chosen_vertices.append(index)
-                if(self.use_one_vertex):
-                    if((v.co - lco).length <= closest_length):
-                        closest_length = (v.co - lco).length
-                        closest_vertex_index = index            
-
-        # update closest vertex
-        if(self.use_one_vertex):                
-            src_chosen_vertices = []
-            if(closest_vertex_index > - 1):
-                src_chosen_vertices.append(closest_vertex_index)            
 
-        return src_chosen_vertices
-
-    # this select function initially starts (if level=0) by matching a point in same space as the source mesh and if it cant find similar positioned point we increment search radius   
-    def select_required_verts(self, vert, rad, level=0):    
-        verts = []
-        if(level > self.number_of_increments):
-            return verts 
-        verts = self.select_vertices(vert, rad)    
-        if(len(verts) == 0):
-            return self.select_required_verts(vert, rad + self.increment_radius, level + 1)
-        else:        
-            return verts
-
-    # set the new vertex position on the shape key
-    def set_vertex_position(self, v_pos):    
-        self.dest_mesh.data.shape_keys.key_blocks[self.dest_shape_key_index].data[self.current_vertex_index].co = v_pos
-
-    # update 1 vertex of destination mesh
-    def update_vertex(self):
-        if(self.current_vertex_index >= self.total_vertices ):
-            return False
+        # query the source basis positions around the selection sphere
+        for co, index, dist in self.src_kdtree.find_range(lco, local_radius):
+            src_chosen_vertices.append(index)
 
-        if(self.do_once_per_vertex):
-            #mathutils now uses the PEP 465 binary operator for multiplying matrices change * to @
-            self.current_vertex = self.dest_mesh.matrix_world @ self.dest_mesh.data.shape_keys.key_blocks[0].data[self.current_vertex_index].co
-            self.src_chosen_vertices = self.select_required_verts(self.current_vertex,0)
-            self.do_once_per_vertex = False
+        return src_chosen_vertices
 
-        if(len(self.src_chosen_vertices) == 0):
-            self.message = ("Failed to find surrounding vertices | Try increasing increment radius | vertex index " + str(self.current_vertex_index) + " at shape key index " + str(self.src_shape_key_index))
-            self.current_vertex_index += 1
+    # this select function initially starts by matching a point in same space as the source mesh and if it cant find similar positioned point we increment search radius
+    # lco is the point in source local space
+    def select_required_verts(self, lco, rad):
+        for level in range(self.number_of_increments + 1):
+            verts = self.select_vertices(lco, (rad + level * self.increment_radius) * self.src_local_scale)
+            if(len(verts)):
+                return verts
+        return []
+
+    # write the buffered positions back to the destination shape keys
+    def flush_vertex_positions(self):
+        key_blocks = self.dest_mesh.data.shape_keys.key_blocks
+        for index, co in self.dest_co.items():
+            set_shape_key_co(key_blocks[index], co)
+        self.dest_co = {}
+
+    # transfer the shape keys one key at a time. The source vertices of each
+    # destination vertex are selected once up front and reused for every key
+    def transfer_vertices(self, key_names):
+        n = len(self.dest_world)
+        neighbors = []
+        matched = np.zeros(n, dtype=np.bool_)
+        for i in progress_range(n):
+            verts = self.select_required_verts(Vector(self.dest_local[i]), 0)
+            neighbors.append(verts)
+            matched[i] = len(verts) > 0
+
+        rows, result = self.matched_rows(matched, key_names)
+        if(len(rows)):
+            # flatten the source vertices of all matched destination vertices,
+            # those of rows[n] are flat_idx[starts[n]:starts[n] + counts[n]]
+            chosen = [neighbors[i] for i in rows]
+            counts = np.fromiter(map(len, chosen), dtype=np.int64, count=len(chosen))
+            flat_idx = np.fromiter(itertools.chain.from_iterable(chosen), dtype=np.int64, count=int(counts.sum()))
+            starts = np.cumsum(counts) - counts
+            inv_counts = (np.float32(1.0) / counts.astype(np.float32))[:, None]
+            base = self.dest_world[rows]
+
+            # average the shape key offsets of the chosen source vertices
+            for key_name in key_names:
+                offsets = self.src_stack[self.src_row[key_name]] - self.src_basis
+                sums = np.add.reduceat(offsets[flat_idx], starts)
+                self.dest_co[self.dest_key_index[key_name]][rows] = sums * inv_counts + base
+        self.flush_vertex_positions()
+        return result
+
+    # indices of the destination vertices which have source vertices to copy
+    # from. If some vertex has none and unpaired vertices are not skipped,
+    # only the vertices before it are transferred and False is returned
+    def matched_rows(self, matched, key_names):
+        result = True
+        if(not matched.all()):
+            first = int(np.argmin(matched))
+            src_index = self.src_key_index[key_names[0]]
+            self.message = ("Failed to find surrounding vertices | Try increasing increment radius | vertex index " + str(first) + " at shape key index " + str(src_index))
             if(not self.skip_vertices_with_no_pair):
-                return True
-            else:
-                return False
-
-        result_position = Vector()
-        for v in self.src_chosen_vertices:
-            result_position +=  self.src_mesh.data.shape_keys.key_blocks[0].data[v].co
-        result_position /= len(self.src_chosen_vertices)
-
-        result_position2 = Vector()
-        for v in self.src_chosen_vertices:
-            result_position2 += self.src_mesh.data.shape_keys.key_blocks[self.src_shape_key_index].data[v].co
-        result_position2 /= len(self.src_chosen_vertices)
-        result = result_position2 - result_position + self.current_vertex
-        self.set_vertex_position(result)
-        return False
-
-    # store shapekey index 
-    def update_global_shapekey_indices(self, p_key_name): 
-        for index, sk in enumerate(self.dest_mesh.data.shape_keys.key_blocks):
-            if sk.name == p_key_name:
-                self.dest_shape_key_index = index
-        for index, sk in enumerate(self.src_mesh.data.shape_keys.key_blocks):
-            if sk.name == p_key_name:
-                self.src_shape_key_index = index
+                matched = matched.copy()
+                matched[first:] = False
+                result = False
+        return np.flatnonzero(matched), result
+
+    # compiled transfer kernel of the selected backend. CUDA falls back to
+    # numba on the CPU, and both fall back to None (the KDTree path) when
+    # their requirements are not installed
+    def get_backend_kernel(self):
+        if(self.backend == 'CUDA'):
+            from . import transfer_cuda
+            if(transfer_cuda.HAS_CUDA):
+                return transfer_cuda.transfer_kernel
+        if(self.backend in ('CUDA', 'NUMBA')):
+            from . import utils_numba
+            if(utils_numba.HAS_NUMBA):
+                return utils_numba.transfer_kernel
+        return None
+
+    # transfer all shape keys with one of the compiled kernels
+    def transfer_compiled(self, key_names, transfer_kernel):
+        n = len(self.dest_world)
+        dest_world = self.dest_world
+
+        # search radii of every increment in source local space
+        radii = np.arange(self.number_of_increments + 1, dtype=np.float32) * np.float32(self.increment_radius * self.src_local_scale)
+
+        src_keys = self.src_stack[[self.src_row[key_name] for key_name in key_names]]
+        offsets = np.empty((len(key_names), n, 3), dtype=np.float32)
+        found = np.empty(n, dtype=np.bool_)
+        transfer_kernel(self.dest_local, self.src_basis, src_keys, radii, self.use_one_vertex, offsets, found)
+
+        rows, result = self.matched_rows(found, key_names)
+        for k, key_name in enumerate(key_names):
+            self.dest_co[self.dest_key_index[key_name]][rows] = offsets[k, rows] + dest_world[rows]
+        self.flush_vertex_positions()
+        return result
+
+    # transfer all shape keys at once when only the closest source vertex
+    # is used. Each destination vertex has a single source vertex, so the
+    # offsets of every shape key can be gathered with one numpy expression
+    def transfer_closest_vertex(self, key_names):
+        n = len(self.dest_world)
+        dest_world = self.dest_world
+
+        # closest source vertex of every destination vertex, -1 if none. One
+        # KDTree query per vertex, accepted if within the largest radius
+        nn_idx = np.full(n, -1, dtype=np.int64)
+        find = self.src_kdtree.find
+        max_radius = self.number_of_increments * self.increment_radius * self.src_local_scale
+        for i in progress_range(n):
+            co, index, dist = find(self.dest_local[i])
+            if(index is not None and dist <= max_radius):
+                nn_idx[i] = index
+
+        rows, result = self.matched_rows(nn_idx >= 0, key_names)
+        nn = nn_idx[rows]
+        base = dest_world[rows] - self.src_basis[nn]
+
+        for key_name in key_names:
+            src_key_co = self.src_stack[self.src_row[key_name]]
+            self.dest_co[self.dest_key_index[key_name]][rows] = src_key_co[nn] + base
+        self.flush_vertex_positions()
+        return result
 
     # if you use copy shape keys. This function will think that the shape
     # keys already exist on the destination mesh and will not actually do
     # any transfer.
     def transfer_shape_keys(self, src, dest, copy_only=False):
-        self.src_mesh   = get_parent(src)
-        self.dest_mesh  = get_parent(dest)
-        self.src_mwi    = self.src_mesh.matrix_world.inverted()
+        parent_map      = build_parent_map()
+        self.src_mesh   = parent_map.get(src)
+        self.dest_mesh  = parent_map.get(dest)
 
         self.current_vertex_index = 0
 
@@ -179,6 +275,12 @@ class ShapeKeyTransfer:
         if(not(self.src_mesh and self.dest_mesh)):
             self.message = "The meshes are not valid!"
             return False
+        mw = np.array(self.src_mesh.matrix_world, dtype=np.float64)
+        rinv = np.linalg.inv(mw[:3, :3])
+        self.src_mwi_np = (rinv.astype(np.float32), (-rinv @ mw[:3, 3]).astype(np.float32))
+        # length of a world space unit in source local space, used to scale
+        # the search radius
+        self.src_local_scale = float(np.linalg.norm(rinv[:, 2]))
         if(self.specify_end_vertex == False):
             self.total_vertices = len(self.dest_mesh.data.vertices)
         if(not hasattr(self.src_mesh.data.shape_keys, "key_blocks")):
@@ -188,39 +290,72 @@ class ShapeKeyTransfer:
         if(not hasattr(self.dest_mesh.data.shape_keys, "key_blocks")):
             self.dest_mesh.shape_key_add(name="Basis")
         # add missing shape keys to dest_mesh
+        dest_names = {sk.name for sk in self.dest_mesh.data.shape_keys.key_blocks}
+        excluded = set(self.excluded_shape_keys)
+        defaults = set(self.default_excluded_keys)
+        list_use = bpy.context.scene.listUse
         for src_shape_key_iter in self.src_mesh.data.shape_keys.key_blocks:
-            insert_sk = True
-            #if use_only_excluded_shape_keys and src_shape_key_iter.name in self.excluded_shape_keys:
-            #    local_shape_key_list.append(src_shape_key_iter.name)
-            for dest_shape_key_iter in self.dest_mesh.data.shape_keys.key_blocks:
-                if(src_shape_key_iter.name == dest_shape_key_iter.name):
-                    insert_sk = False
-            if insert_sk:
-                if bpy.context.scene.listUse == 'include' and src_shape_key_iter.name in self.excluded_shape_keys and \
-                   not src_shape_key_iter.name in self.default_excluded_keys:
-                    self.dest_mesh.shape_key_add(name=src_shape_key_iter.name)
-                    local_shape_key_list.append(src_shape_key_iter.name)
-                if bpy.context.scene.listUse == 'exclude' and not src_shape_key_iter.name in self.excluded_shape_keys and \
-                   not src_shape_key_iter.name in self.default_excluded_keys:
-                    self.dest_mesh.shape_key_add(name=src_shape_key_iter.name)
-                    local_shape_key_list.append(src_shape_key_iter.name)
-                elif bpy.context.scene.listUse == 'all' and not src_shape_key_iter.name in self.default_excluded_keys:
-                    self.dest_mesh.shape_key_add(name=src_shape_key_iter.name)
-                    local_shape_key_list.append(src_shape_key_iter.name)
+            name = src_shape_key_iter.name
+            if name in dest_names or name in defaults:
+                continue
+            if list_use == 'include' and name not in excluded:
+                continue
+            if list_use == 'exclude' and name in excluded:
+                continue
+            self.dest_mesh.shape_key_add(name=name)
+            local_shape_key_list.append(name)
 
         if copy_only:
             self.message = "Success"
             return True
 
-        # all vertices in destination mesh
-        while(self.current_vertex_index < self.total_vertices):
-            self.do_once_per_vertex = True
-            print("Vertex: " + str(self.current_vertex_index) + "/" + str(self.total_vertices))
-            for key_name in local_shape_key_list:
-                self.update_global_shapekey_indices(key_name)
-                if(self.update_vertex()):
-                    return False
-            self.current_vertex_index += 1
+        if(not local_shape_key_list):
+            self.message = "Transferred Shape Keys successfully!"
+            return True
+
+        # read the basis and shape key positions in bulk
+        src_key_blocks = self.src_mesh.data.shape_keys.key_blocks
+        dest_key_blocks = self.dest_mesh.data.shape_keys.key_blocks
+        self.src_key_index = {sk.name: index for index, sk in enumerate(src_key_blocks)}
+        self.dest_key_index = {sk.name: index for index, sk in enumerate(dest_key_blocks)}
+        self.src_stack = np.empty((len(local_shape_key_list) + 1, len(src_key_blocks[0].data), 3), dtype=np.float32)
+        self.src_row = {}
+        get_shape_key_co(src_key_blocks[0], self.src_stack[0])
+        for row, key_name in enumerate(local_shape_key_list, 1):
+            get_shape_key_co(src_key_blocks[self.src_key_index[key_name]], self.src_stack[row])
+            self.src_row[key_name] = row
+        self.src_basis = self.src_stack[0]
+        self.dest_basis = get_shape_key_co(dest_key_blocks[0])
+
+        # destination basis in world space and in source local space,
+        # transformed with one matmul each rather than per vertex
+        mw = np.array(self.dest_mesh.matrix_world, dtype=np.float32)
+        rinv, tinv = self.src_mwi_np
+        self.dest_world = self.dest_basis[:self.total_vertices] @ mw[:3, :3].T + mw[:3, 3]
+        self.dest_local = np.ascontiguousarray(self.dest_world @ rinv.T + tinv)
+
+        # buffer the destination positions and write each key back in one go
+        self.dest_co = {}
+        for key_name in local_shape_key_list:
+            index = self.dest_key_index[key_name]
+            self.dest_co[index] = get_shape_key_co(dest_key_blocks[index])
+
+        transfer_kernel = self.get_backend_kernel()
+        if(transfer_kernel is not None):
+            result = self.transfer_compiled(local_shape_key_list, transfer_kernel)
+        else:
+            # build a KDTree of the source basis positions in source local space
+            self.src_kdtree = KDTree(len(self.src_basis))
+            for index, co in enumerate(self.src_basis):
+                self.src_kdtree.insert(co, index)
+            self.src_kdtree.balance()
+
+            if(self.use_one_vertex):
+                result = self.transfer_closest_vertex(local_shape_key_list)
+            else:
+                result = self.transfer_vertices(local_shape_key_list)
+        if(not result):
+            return False
         self.message = "Transferred Shape Keys successfully!"
         return True
     
@@ -257,11 +392,15 @@ SKT = ShapeKeyTransfer()
 # Helper function to check if a valid selection is made
 # ----------------------------------------------------------
 
-def can_transfer_keys():
+def can_transfer_keys(context):
     """Checks if selected source and destination meshes are valid"""
-    skt = bpy.context.scene.shapekeytransferSettings
-    if(skt.src_mesh and skt.dest_mesh):
-        if(skt.src_mesh == skt.dest_mesh):
+    # called from the panel draw and every operator poll, so read each
+    # pointer property only once
+    skt = context.scene.shapekeytransferSettings
+    src_mesh = skt.src_mesh
+    dest_mesh = skt.dest_mesh
+    if(src_mesh and dest_mesh):
+        if(src_mesh == dest_mesh):
             return False
         else:
             return True
@@ -280,12 +419,12 @@ class CopyKeyNamesOperator(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        skt = bpy.context.scene.shapekeytransferSettings
+        skt = context.scene.shapekeytransferSettings
         return (skt.src_mesh is not None)
 
     def execute(self, context):
         global SKT
-        skt = bpy.context.scene.shapekeytransferSettings        
+        skt = context.scene.shapekeytransferSettings        
         if(skt.src_mesh):
             if(SKT.get_shape_keys_mesh(skt.src_mesh)):
                 self.report({'INFO'}, SKT.message)                
@@ -296,7 +435,7 @@ class CopyKeyNamesOperator(bpy.types.Operator):
                     if(key == "Basis"):
                         continue
                     temp_str += key + "\n"
-                bpy.context.window_manager.clipboard = temp_str
+                context.window_manager.clipboard = temp_str
                 self.report({'INFO'}, "Copied to clipboard")
         else:
             self.report({'INFO'}, "Invalid Source Mesh")
@@ -314,7 +453,7 @@ class InsertKeyNamesOperator(bpy.types.Operator):
 
     def execute(self, context):
         scn = context.scene
-        for key in bpy.context.window_manager.clipboard.split("\n"):
+        for key in context.window_manager.clipboard.split("\n"):
             if(len(key)):
                 item = scn.customshapekeylist.add()
                 item.name = key
@@ -336,13 +475,17 @@ class CopyDrivers(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        return can_transfer_keys()
+        return can_transfer_keys(context)
 
     def execute(self, context):
-        skt = bpy.context.scene.shapekeytransferSettings
-        driverOp = Drivers(get_parent(skt.src_mesh), get_parent(skt.dest_mesh))
+        from .copydrivers import Drivers
+        skt = context.scene.shapekeytransferSettings
+        parent_map = build_parent_map()
+        src_obj = parent_map.get(skt.src_mesh)
+        dst_obj = parent_map.get(skt.dest_mesh)
+        driverOp = Drivers.from_objects(src_obj, dst_obj)
         num_drivers = driverOp.copy()
-        self.report({'INFO'}, "Copied " + str(num_drivers) +" drivers from " + get_parent(skt.src_mesh).name)
+        self.report({'INFO'}, "Copied " + str(num_drivers) +" drivers from " + src_obj.name)
         return {'FINISHED'}
 
 class CopyShapeKeys(bpy.types.Operator):
@@ -355,12 +498,12 @@ class CopyShapeKeys(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        return can_transfer_keys()
+        return can_transfer_keys(context)
 
     def execute(self, context):
         global SKT
         global shapes_transferred
-        skt = bpy.context.scene.shapekeytransferSettings        
+        skt = context.scene.shapekeytransferSettings        
 
         SKT.update_shape_keys_list(context.scene.customshapekeylist)
         result = SKT.transfer_shape_keys(skt.src_mesh, skt.dest_mesh, copy_only=True)
@@ -385,19 +528,21 @@ class TransferShapeKeyOperator(bpy.types.Operator):
     use_one_vertex   : TransferShapeKeysOperatorUI.use_one_vertex
     skip_unpaired_vertices : TransferShapeKeysOperatorUI.skip_unpaired_vertices
     number_of_increments : TransferShapeKeysOperatorUI.number_of_increments
+    backend : TransferShapeKeysOperatorUI.backend
 
     @classmethod
     def poll(cls, context):
-        return can_transfer_keys()
+        return can_transfer_keys(context)
 
     def execute(self, context):
         global SKT
         global shapes_transferred
-        skt = bpy.context.scene.shapekeytransferSettings        
+        skt = context.scene.shapekeytransferSettings        
         SKT.increment_radius = self.increment_radius
         SKT.use_one_vertex   = self.use_one_vertex
         SKT.skip_vertices_with_no_pair = self.skip_unpaired_vertices
         SKT.number_of_increments = self.number_of_increments
+        SKT.backend = self.backend
 
         SKT.update_shape_keys_list(context.scene.customshapekeylist)
         result = SKT.transfer_shape_keys(skt.src_mesh, skt.dest_mesh)
@@ -416,6 +561,7 @@ class TransferShapeKeyOperator(bpy.types.Operator):
         col.prop(self, "use_one_vertex")
         col.prop(self, "skip_unpaired_vertices")
         col.prop(self, "number_of_increments")
+        col.prop(self, "backend")
 
 # Transfer Shape Keys in excluded shape keys list Button  (Operator)
 # ----------------------------------------------------------
@@ -432,19 +578,21 @@ class TransferExcludedShapeKeyOperator(bpy.types.Operator):
     use_one_vertex   : TransferShapeKeysOperatorUI.use_one_vertex
     skip_unpaired_vertices : TransferShapeKeysOperatorUI.skip_unpaired_vertices
     number_of_increments : TransferShapeKeysOperatorUI.number_of_increments
+    backend : TransferShapeKeysOperatorUI.backend
 
     @classmethod
     def poll(cls, context):
-        return can_transfer_keys()
+        return can_transfer_keys(context)
 
     def execute(self, context):
         global SKT
         global shapes_transferred
-        skt = bpy.context.scene.shapekeytransferSettings
+        skt = context.scene.shapekeytransferSettings
         SKT.increment_radius = self.increment_radius
         SKT.use_one_vertex   = self.use_one_vertex
         SKT.skip_vertices_with_no_pair = self.skip_unpaired_vertices
         SKT.number_of_increments = self.number_of_increments
+        SKT.backend = self.backend
 
         SKT.update_shape_keys_list(context.scene.customshapekeylist)
         result = SKT.transfer_shape_keys(skt.src_mesh, skt.dest_mesh)
@@ -463,6 +611,7 @@ class TransferExcludedShapeKeyOperator(bpy.types.Operator):
         col.prop(self, "use_one_vertex")
         col.prop(self, "skip_unpaired_vertices")
         col.prop(self, "number_of_increments")
+        col.prop(self, "backend")
 
 # Remove all Shape Keys in source mesh Button (Operator)
 # ----------------------------------------------------------
@@ -477,22 +626,22 @@ class RemoveShapeKeyOperator(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        skt = bpy.context.scene.shapekeytransferSettings
+        skt = context.scene.shapekeytransferSettings
         return (skt.src_mesh is not None)
 
     def execute(self, context):
         global SKT
-        skt = bpy.context.scene.shapekeytransferSettings        
+        skt = context.scene.shapekeytransferSettings        
         if(skt.src_mesh):
             ob = get_parent(skt.src_mesh)
             if(ob.data.shape_keys):
-                basis = None
-                for x in ob.data.shape_keys.key_blocks:
-                    if(basis):
+                try:
+                    ob.shape_key_clear()
+                except AttributeError:
+                    # remove from the end so the remaining keys are not
+                    # reindexed on every removal
+                    for x in list(ob.data.shape_keys.key_blocks)[::-1]:
                         ob.shape_key_remove(x)
-                    else:
-                        basis = x
-                ob.shape_key_remove(basis)
             self.report({'INFO'}, "Removed all shape keys in source mesh!")
         else:
             self.report({'ERROR'}, "Select a valid source mesh!")            
@@ -547,7 +696,7 @@ class CUSTOM_OT_actions(bpy.types.Operator):
                 self.report({'INFO'}, info)
             
         if self.action == 'ADD':                               
-            scn = bpy.context.scene
+            scn = context.scene
             item = scn.customshapekeylist.add()
             item.name = "key"
             item.obj_type = "STRING"
@@ -669,13 +818,13 @@ class VIEW3D_PT_tools_ShapeKeyTransfer(bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
-        scn = bpy.context.scene
+        scn = context.scene
         skt = context.scene.shapekeytransferSettings
 
         icon_expand = "DISCLOSURE_TRI_RIGHT"
         icon_collapse = "DISCLOSURE_TRI_DOWN"
         
-        if(not can_transfer_keys()):
+        if(not can_transfer_keys(context)):
             layout.label(text="Select required meshes", icon = 'INFO')
         
         layout.prop(skt, "src_mesh", text="Source Mesh") 
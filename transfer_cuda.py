@@ -0,0 +1,130 @@
+#----------------------------------------------------------
+# File transfer_cuda.py
+#----------------------------------------------------------
+#
+# Optional CUDA transfer kernel. Requires numba and a CUDA capable GPU, so
+# the kernel is only defined when both are available. Callers must check
+# HAS_CUDA before using it.
+#
+# ----------------------------------------------------------
+
+import importlib.util
+
+HAS_CUDA = False
+if importlib.util.find_spec('numba') is not None:
+    from numba import cuda
+    HAS_CUDA = cuda.is_available()
+
+# one thread per destination vertex, the source basis is loaded into shared
+# memory one tile of this many vertices at a time
+THREADS_PER_BLOCK = 128
+
+if HAS_CUDA:
+    from numba import float32
+
+    # Device version of utils_numba.transfer_kernel, see there for the
+    # meaning of the arguments.
+    @cuda.jit
+    def knn_and_delta(query, src_basis, src_keys, radii, use_one, out, found):
+        tile = cuda.shared.array(shape=(THREADS_PER_BLOCK, 3), dtype=float32)
+        i = cuda.grid(1)
+        tx = cuda.threadIdx.x
+        n_dst = query.shape[0]
+        n_src = src_basis.shape[0]
+        n_keys = src_keys.shape[0]
+
+        # threads past the last vertex still help loading the tiles
+        active = i < n_dst
+        qx = float32(0.0)
+        qy = float32(0.0)
+        qz = float32(0.0)
+        if active:
+            qx = query[i, 0]
+            qy = query[i, 1]
+            qz = query[i, 2]
+
+        # closest source vertex
+        best = -1
+        best_d2 = float32(3.4e38)
+        for start in range(0, n_src, THREADS_PER_BLOCK):
+            j = start + tx
+            if j < n_src:
+                tile[tx, 0] = src_basis[j, 0]
+                tile[tx, 1] = src_basis[j, 1]
+                tile[tx, 2] = src_basis[j, 2]
+            cuda.syncthreads()
+            if active:
+                for t in range(min(THREADS_PER_BLOCK, n_src - start)):
+                    dx = tile[t, 0] - qx
+                    dy = tile[t, 1] - qy
+                    dz = tile[t, 2] - qz
+                    d2 = dx * dx + dy * dy + dz * dz
+                    if d2 < best_d2:
+                        best_d2 = d2
+                        best = start + t
+            cuda.syncthreads()
+
+        # smallest search radius which contains the closest vertex
+        r2 = float32(-1.0)
+        if active and best >= 0:
+            for k in range(radii.shape[0]):
+                if best_d2 <= radii[k] * radii[k]:
+                    r2 = radii[k] * radii[k]
+                    break
+        paired = active and r2 >= float32(0.0)
+        if active:
+            found[i] = paired
+
+        if use_one:
+            if paired:
+                for k in range(n_keys):
+                    for c in range(3):
+                        out[k, i, c] = src_keys[k, best, c] - src_basis[best, c]
+            return
+
+        # average the offsets of every vertex within the radius
+        if paired:
+            for k in range(n_keys):
+                for c in range(3):
+                    out[k, i, c] = float32(0.0)
+        count = 0
+        for start in range(0, n_src, THREADS_PER_BLOCK):
+            j = start + tx
+            if j < n_src:
+                tile[tx, 0] = src_basis[j, 0]
+                tile[tx, 1] = src_basis[j, 1]
+                tile[tx, 2] = src_basis[j, 2]
+            cuda.syncthreads()
+            if paired:
+                for t in range(min(THREADS_PER_BLOCK, n_src - start)):
+                    dx = tile[t, 0] - qx
+                    dy = tile[t, 1] - qy
+                    dz = tile[t, 2] - qz
+                    d2 = dx * dx + dy * dy + dz * dz
+                    if d2 <= r2:
+                        count += 1
+                        for k in range(n_keys):
+                            for c in range(3):
+                                out[k, i, c] += src_keys[k, start + t, c] - tile[t, c]
+            cuda.syncthreads()
+        if paired:
+            inv = float32(1.0) / float32(count)
+            for k in range(n_keys):
+                for c in range(3):
+                    out[k, i, c] *= inv
+
+    # same interface as utils_numba.transfer_kernel, copies the arrays to
+    # and from the device around the kernel launch
+    def transfer_kernel(query, src_basis, src_keys, radii, use_one, out, found):
+        if len(query) == 0:
+            return
+        d_out = cuda.device_array_like(out)
+        d_found = cuda.device_array_like(found)
+        blocks = (len(query) + THREADS_PER_BLOCK - 1) // THREADS_PER_BLOCK
+        knn_and_delta[blocks, THREADS_PER_BLOCK](cuda.to_device(query),
+                                                 cuda.to_device(src_basis),
+                                                 cuda.to_device(src_keys),
+                                                 cuda.to_device(radii),
+                                                 use_one, d_out, d_found)
+        d_out.copy_to_host(out)
+        d_found.copy_to_host(found)
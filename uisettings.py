@@ -96,6 +96,17 @@ class TransferShapeKeysOperatorUI(PropertyGroup):
         min = 1
         )
 
+    backend = EnumProperty(
+        name = "Backend",
+        description = "Method used to find the source vertices of each destination vertex.",
+        items = [
+            ('KDTREE', "KDTree", "Search a KDTree of the source vertices"),
+            ('NUMBA', "Numba", "Compiled parallel search, requires numba to be installed. Falls back to KDTree otherwise"),
+            ('CUDA', "CUDA", "Search on the GPU, requires numba and a CUDA capable GPU. Falls back to Numba otherwise")
+        ],
+        default = 'KDTREE'
+        )
+
 # Property of 1 item in the excluded shape key list
 # ----------------------------------------------------------
 
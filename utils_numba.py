@@ -0,0 +1,177 @@
+#----------------------------------------------------------
+# File utils_numba.py
+#----------------------------------------------------------
+#
+# Optional compiled transfer kernel. numba is not shipped with Blender, so
+# this module only defines the kernel when numba is installed in Blender's
+# python. Callers must check HAS_NUMBA before using it.
+#
+# ----------------------------------------------------------
+
+import importlib.util
+
+HAS_NUMBA = importlib.util.find_spec('numba') is not None
+
+# the search grid has at most this many cells along each axis
+MAX_GRID_CELLS = 1024
+
+if HAS_NUMBA:
+    import numpy as np
+    from numba import njit, prange
+
+    # Sort the source vertices into a uniform grid. Only the occupied cells
+    # are stored: ids holds their sorted linear ids and the vertices of
+    # ids[n] are order[starts[n]:ends[n]].
+    def build_grid(src_basis, cell):
+        origin = src_basis.min(axis=0)
+        extent = (src_basis.max(axis=0) - origin).max()
+        cell = max(cell, extent / MAX_GRID_CELLS, 1e-6)
+        ijk = np.floor((src_basis - origin) / cell).astype(np.int64)
+        dims = ijk.max(axis=0) + 1
+        cell_id = (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+        order = np.argsort(cell_id, kind='stable')
+        ids, starts = np.unique(cell_id[order], return_index=True)
+        starts = starts.astype(np.int64)
+        ends = np.append(starts[1:], len(order)).astype(np.int64)
+        return (origin.astype(np.float32), np.float32(cell), dims.astype(np.int64),
+                ids, starts, ends, order.astype(np.int64))
+
+    # squared distance from q to the cell [lo, lo + cell] along one axis
+    @njit('float32(float32, float32, float32)', cache=True)
+    def _axis_dist2(q, lo, cell):
+        if q < lo:
+            return (lo - q) * (lo - q)
+        if q > lo + cell:
+            return (q - lo - cell) * (q - lo - cell)
+        return np.float32(0.0)
+
+    # For every query point (a destination basis vertex in source local
+    # space) find the source basis vertices to copy from and write the
+    # shape key offsets of all keys into out[key, vertex].
+    #
+    # radii holds the growing search radii in source local space. The first
+    # radius which contains at least one source vertex is used. With use_one
+    # only the closest vertex is used, otherwise the offsets of all vertices
+    # within that radius are averaged. found[vertex] is False when no radius
+    # contains a source vertex, in which case out is left untouched.
+    #
+    # Only the grid cells within reach of the radius are visited, and a cell
+    # is skipped without looking at its vertices when its box is already
+    # further away than the radius.
+    #
+    # The source basis is passed as separate x, y and z arrays sorted in grid
+    # order, so the vertices of a cell are contiguous in each array and the
+    # distance loop can use packed SIMD loads.
+    #
+    # Blender stores coordinates in single precision, so the kernel is
+    # compiled for float32 only and no value is promoted to float64.
+    @njit('void(float32[:, :], float32[:], float32[:], float32[:], '
+          'float32[:, :, :], float32[:], boolean, float32[:, :, :], boolean[:], '
+          'float32[:], float32, int64[:], int64[:], int64[:], int64[:], int64[:])',
+          parallel=True, fastmath=True, cache=True)
+    def _grid_kernel(query, sx, sy, sz, src_keys, radii, use_one, out, found,
+                     origin, cell, dims, ids, starts, ends, order):
+        n_dst = query.shape[0]
+        n_keys = src_keys.shape[0]
+        r_max2 = radii[-1] * radii[-1]
+        for i in prange(n_dst):
+            found[i] = False
+            qx = query[i, 0]
+            qy = query[i, 1]
+            qz = query[i, 2]
+            ci = int(np.floor((qx - origin[0]) / cell))
+            cj = int(np.floor((qy - origin[1]) / cell))
+            ck = int(np.floor((qz - origin[2]) / cell))
+
+            # closest source vertex within the largest radius
+            reach = int(np.ceil(radii[-1] / cell))
+            best = -1
+            best_d2 = r_max2
+            for a in range(max(ci - reach, 0), min(ci + reach, dims[0] - 1) + 1):
+                da = _axis_dist2(qx, origin[0] + np.float32(a) * cell, cell)
+                for b in range(max(cj - reach, 0), min(cj + reach, dims[1] - 1) + 1):
+                    db = da + _axis_dist2(qy, origin[1] + np.float32(b) * cell, cell)
+                    for c in range(max(ck - reach, 0), min(ck + reach, dims[2] - 1) + 1):
+                        if db + _axis_dist2(qz, origin[2] + np.float32(c) * cell, cell) > best_d2:
+                            continue
+                        cid = (a * dims[1] + b) * dims[2] + c
+                        pos = np.searchsorted(ids, cid)
+                        if pos == len(ids) or ids[pos] != cid:
+                            continue
+                        for p in range(starts[pos], ends[pos]):
+                            dx = sx[p] - qx
+                            dy = sy[p] - qy
+                            dz = sz[p] - qz
+                            d2 = dx * dx + dy * dy + dz * dz
+                            if d2 < best_d2 or (best < 0 and d2 <= best_d2):
+                                best_d2 = d2
+                                best = p
+            if best < 0:
+                continue
+
+            # smallest search radius which contains the closest vertex
+            r = radii[-1]
+            for k in range(radii.shape[0]):
+                if best_d2 <= radii[k] * radii[k]:
+                    r = radii[k]
+                    break
+            r2 = r * r
+            found[i] = True
+
+            if use_one:
+                j = order[best]
+                for k in range(n_keys):
+                    out[k, i, 0] = src_keys[k, j, 0] - sx[best]
+                    out[k, i, 1] = src_keys[k, j, 1] - sy[best]
+                    out[k, i, 2] = src_keys[k, j, 2] - sz[best]
+                continue
+
+            # average the offsets of every vertex within the radius
+            for k in range(n_keys):
+                for c in range(3):
+                    out[k, i, c] = 0.0
+            count = 0
+            reach = int(np.ceil(r / cell))
+            for a in range(max(ci - reach, 0), min(ci + reach, dims[0] - 1) + 1):
+                da = _axis_dist2(qx, origin[0] + np.float32(a) * cell, cell)
+                for b in range(max(cj - reach, 0), min(cj + reach, dims[1] - 1) + 1):
+                    db = da + _axis_dist2(qy, origin[1] + np.float32(b) * cell, cell)
+                    for c in range(max(ck - reach, 0), min(ck + reach, dims[2] - 1) + 1):
+                        if db + _axis_dist2(qz, origin[2] + np.float32(c) * cell, cell) > r2:
+                            continue
+                        cid = (a * dims[1] + b) * dims[2] + c
+                        pos = np.searchsorted(ids, cid)
+                        if pos == len(ids) or ids[pos] != cid:
+                            continue
+                        for p in range(starts[pos], ends[pos]):
+                            dx = sx[p] - qx
+                            dy = sy[p] - qy
+                            dz = sz[p] - qz
+                            d2 = dx * dx + dy * dy + dz * dz
+                            if d2 <= r2:
+                                count += 1
+                                j = order[p]
+                                for k in range(n_keys):
+                                    out[k, i, 0] += src_keys[k, j, 0] - sx[p]
+                                    out[k, i, 1] += src_keys[k, j, 1] - sy[p]
+                                    out[k, i, 2] += src_keys[k, j, 2] - sz[p]
+            if count > 0:
+                inv = np.float32(1.0) / np.float32(count)
+                for k in range(n_keys):
+                    for c in range(3):
+                        out[k, i, c] *= inv
+
+    # see _grid_kernel. The grid cell is a few search increments wide
+    def transfer_kernel(query, src_basis, src_keys, radii, use_one, out, found):
+        found[:] = False
+        if len(src_basis) == 0:
+            return
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        src_keys = np.ascontiguousarray(src_keys, dtype=np.float32)
+        radii = np.ascontiguousarray(radii, dtype=np.float32)
+        grid = build_grid(src_basis, 4 * radii[1])
+        order = grid[-1]
+        sx = np.ascontiguousarray(src_basis[order, 0])
+        sy = np.ascontiguousarray(src_basis[order, 1])
+        sz = np.ascontiguousarray(src_basis[order, 2])
+        _grid_kernel(query, sx, sy, sz, src_keys, radii, use_one, out, found, *grid)